@@ -12,6 +12,7 @@ else:
     out = sys.stdout
 from collections import OrderedDict
 import itertools
+import math
 from graph_tool.all import *
 import numpy.random
 from numpy.random import randint, normal, random
@@ -137,6 +138,18 @@ for pvals in iter_ranges(pranges):
                                                    exact=exact)),
               bstate.get_nonempty_B(), file=out)
 
+        if layered != False:
+            state.mcmc_sweep(beta=0,
+                             entropy_args=dict(dl=dl,
+                                               degree_dl_kind=degree_dl_kind,
+                                               exact=exact))
+            bstate = state.get_block_state(vweight=True, deg_corr=deg_corr)
+            bstate_alt = state.copy().get_block_state(vweight=True,
+                                                      deg_corr=deg_corr)
+            assert math.isclose(bstate.entropy(), bstate_alt.entropy(),
+                                abs_tol=1e-8), \
+                "inconsistent layered block degrees after sweep"
+
     print("\t merge", file=out)
 
     state = gen_state(directed, deg_corr, layered, overlap, rec_, rec, allow_empty)
@@ -174,6 +174,28 @@ struct export_vector_types
             .def("__getstate__", &get_vector_state<ValueType>)
             .def("__setstate__", &set_vector_state<ValueType>)
             .enable_pickling();
+        wrap_iota(vc, std::integral_constant<bool,
+                                             std::is_integral<ValueType>::value &&
+                                             !std::is_same<ValueType, bool>::value &&
+                                             !std::is_same<ValueType, char>::value>());
+    }
+
+    template <class ValueType>
+    void wrap_iota(class_<vector<ValueType> >& vc, std::true_type) const
+    {
+        std::function<void(vector<ValueType>&, size_t n)> iota =
+            [] (vector<ValueType>& v, size_t n)
+            {
+                v.resize(n);
+                for (size_t i = 0; i < n; ++i)
+                    v[i] = i;
+            };
+        vc.def("iota", iota);
+    }
+
+    template <class ValueType>
+    void wrap_iota(class_<vector<ValueType> >&, std::false_type) const
+    {
     }
 
     template <class ValueType>
@@ -163,9 +163,6 @@ void split_layers(GraphInterface& gi, boost::any& aec, boost::any& ab,
                                    size_t r =  b[v];
                                    size_t u_r;
 
-                                   if (block_map.size() <= l)
-                                       block_map.resize(l + 1);
-
                                    auto& bmap = block_map[l];
                                    auto riter = bmap.find(r);
                                    if (riter == bmap.end())
@@ -187,6 +184,9 @@ void split_layers(GraphInterface& gi, boost::any& aec, boost::any& ab,
                                }
                            };
 
+                       if (block_map.size() < us.size())
+                           block_map.resize(us.size());
+
                        for (auto e : edges_range(g))
                        {
                            auto s = source(e, g);
@@ -300,34 +300,6 @@ void get_rvmap(GraphInterface& gi, boost::any& avc, boost::any& avmap,
 }
 
 
-void get_lweights(GraphInterface& gi, boost::any& avc, boost::any& avmap,
-                  boost::any& alweight, boost::python::object& ouvweight)
-{
-    typedef vprop_map_t<int32_t>::type vmap_t;
-    typedef vprop_map_t<vector<int32_t>>::type vvmap_t;
-
-    vvmap_t& vc = any_cast<vvmap_t&>(avc);
-    vvmap_t& vmap = any_cast<vvmap_t&>(avmap);
-    vvmap_t& lweight = any_cast<vvmap_t&>(alweight);
-
-    auto uvweight = from_any_list<vmap_t>(ouvweight);
-
-    run_action<>()(gi, [&](auto& g)
-                   {
-                       for (auto v : vertices_range(g))
-                       {
-                           for (size_t i = 0; i < vc[v].size(); ++i)
-                           {
-                               auto l = vc[v][i];
-                               auto u = vmap[v][i];
-                               auto w = uvweight[l].get()[u];
-                               lweight[v].push_back(l);
-                               lweight[v].push_back(w);
-                           }
-                       }
-                   })();
-}
-
 void get_blweights(GraphInterface& gi, boost::any& ab, boost::any& avc,
                    boost::any& avmap, boost::any& alweight,
                    boost::python::object& ouvweight)
@@ -371,6 +343,75 @@ void get_blweights(GraphInterface& gi, boost::any& ab, boost::any& avc,
 }
 
 
+void get_layered_block_graph(GraphInterface& gi, GraphInterface& bgi,
+                             boost::any& ab, boost::any& aec,
+                             boost::any& aeweight,
+                             boost::python::object& arec,
+                             boost::python::object& adrec,
+                             boost::any& abmrs, boost::any& abec,
+                             boost::python::object& obrec,
+                             boost::python::object& obdrec)
+{
+    typedef vprop_map_t<int32_t>::type vmap_t;
+    typedef eprop_map_t<int32_t>::type emap_t;
+    typedef eprop_map_t<double>::type remap_t;
+    typedef GraphInterface::edge_t bedge_t;
+
+    vmap_t& b = any_cast<vmap_t&>(ab);
+    emap_t& ec = any_cast<emap_t&>(aec);
+    emap_t& eweight = any_cast<emap_t&>(aeweight);
+    auto rec = from_any_list<remap_t>(arec);
+    auto drec = from_any_list<remap_t>(adrec);
+
+    emap_t& bmrs = any_cast<emap_t&>(abmrs);
+    emap_t& bec = any_cast<emap_t&>(abec);
+    auto brec = from_any_list<remap_t>(obrec);
+    auto bdrec = from_any_list<remap_t>(obdrec);
+
+    auto& bg = bgi.get_graph();
+
+    run_action<>()(gi,
+                   [&](auto& g)
+                   {
+                       gt_hash_map<std::tuple<size_t, size_t, size_t>, bedge_t>
+                           emap;
+
+                       for (auto e : edges_range(g))
+                       {
+                           size_t r = b[source(e, g)];
+                           size_t s = b[target(e, g)];
+                           size_t l = ec[e];
+                           if (!graph_tool::is_directed(g) && r > s)
+                               std::swap(r, s);
+
+                           auto key = std::make_tuple(r, s, l);
+                           auto iter = emap.find(key);
+                           bedge_t be;
+                           if (iter == emap.end())
+                           {
+                               be = add_edge(r, s, bg).first;
+                               emap[key] = be;
+                               bmrs[be] = 0;
+                               bec[be] = l;
+                               for (size_t i = 0; i < rec.size(); ++i)
+                                   brec[i].get()[be] = 0;
+                               for (size_t i = 0; i < drec.size(); ++i)
+                                   bdrec[i].get()[be] = 0;
+                           }
+                           else
+                           {
+                               be = iter->second;
+                           }
+
+                           bmrs[be] += eweight[e];
+                           for (size_t i = 0; i < rec.size(); ++i)
+                               brec[i].get()[be] += rec[i].get()[e];
+                           for (size_t i = 0; i < drec.size(); ++i)
+                               bdrec[i].get()[be] += drec[i].get()[e];
+                       }
+                   })();
+}
+
 bool bmap_has(const vbmap_t& bmap, size_t c, size_t r)
 {
     if (c > bmap.size())
@@ -475,7 +516,7 @@ ldegs_map_t get_layered_block_degs(GraphInterface& gi, boost::any aeweight,
     return degs;
 }
 
-degs_map_t get_mapped_block_degs(GraphInterface& gi, ldegs_map_t& ldegs,
+degs_map_t get_mapped_block_degs(GraphInterface& gi, const ldegs_map_t& ldegs,
                                  int l, boost::any avmap)
 {
     degs_map_t ndegs;
@@ -487,7 +528,10 @@ degs_map_t get_mapped_block_degs(GraphInterface& gi, ldegs_map_t& ldegs,
                        {
                            int v = vmap[u];
                            auto& d = ndegs[u];
-                           for (auto& ks : ldegs[std::make_tuple(l, v)])
+                           auto iter = ldegs.find(std::make_tuple(l, v));
+                           if (iter == ldegs.end())
+                               continue;
+                           for (auto& ks : iter->second)
                                d.emplace_back(get<0>(ks.first), get<1>(ks.first),
                                               ks.second);
                        }
@@ -495,32 +539,84 @@ degs_map_t get_mapped_block_degs(GraphInterface& gi, ldegs_map_t& ldegs,
     return ndegs;
 }
 
-ldegs_map_t get_ldegs(GraphInterface& gi, boost::any& avc, boost::any& avmap,
-                      boost::python::object& oudegs)
+python::list get_layers_mapped_block_degs(boost::python::object& ous,
+                                          const ldegs_map_t& ldegs,
+                                          boost::python::object& ouvmap)
+{
+    auto us = from_rlist<GraphInterface>(ous);
+    auto uvmap = from_any_list<vmap_t>(ouvmap);
+
+    std::vector<degs_map_t> udegs;
+    for (auto& u : us)
+        udegs.emplace_back(u.get().get_num_vertices(false));
+
+    size_t L = us.size();
+    #pragma omp parallel for schedule(runtime) if (L > 1)
+    for (size_t l = 0; l < L; ++l)
+    {
+        auto& u = us[l].get().get_graph();
+        auto vmap = uvmap[l].get().get_unchecked(num_vertices(u));
+        auto ndegs = udegs[l].get_unchecked(num_vertices(u));
+        for (auto w : vertices_range(u))
+        {
+            auto iter = ldegs.find(std::make_tuple(int(l + 1), int(vmap[w])));
+            if (iter == ldegs.end())
+                continue;
+            auto& d = ndegs[w];
+            for (auto& ks : iter->second)
+                d.emplace_back(get<0>(ks.first), get<1>(ks.first),
+                               ks.second);
+        }
+    }
+
+    python::list ret;
+    for (auto& degs : udegs)
+        ret.append(degs);
+    return ret;
+}
+
+ldegs_map_t get_lweights_ldegs(GraphInterface& gi, boost::any& avc,
+                               boost::any& avmap, boost::any& alweight,
+                               boost::python::object& ouvweight,
+                               boost::python::object& oudegs)
 {
+    typedef vprop_map_t<int32_t>::type vmap_t;
     typedef vprop_map_t<vector<int32_t>>::type vvmap_t;
 
     vvmap_t& vc = any_cast<vvmap_t&>(avc);
     vvmap_t& vmap = any_cast<vvmap_t&>(avmap);
+    vvmap_t& lweight = any_cast<vvmap_t&>(alweight);
 
+    auto uvweight = from_any_list<vmap_t>(ouvweight);
     auto udegs = from_rlist<degs_map_t>(oudegs);
+    bool with_degs = !udegs.empty();
 
     ldegs_map_t ndegs;
     run_action<>()(gi, [&](auto& g)
                    {
-                       gt_hash_map<size_t, gt_hash_map<size_t, size_t>> blw;
                        for (int v : vertices_range(g))
                        {
-                           auto& d = udegs[0].get()[v];
-                           auto& h = ndegs[std::make_tuple(0, v)];
-                           for (auto& kn : d)
-                               h[std::make_tuple(get<0>(kn), get<1>(kn))] =
-                                   get<2>(kn);
+                           if (with_degs)
+                           {
+                               auto& d = udegs[0].get()[v];
+                               auto& h = ndegs[std::make_tuple(0, v)];
+                               for (auto& kn : d)
+                                   h[std::make_tuple(get<0>(kn), get<1>(kn))] =
+                                       get<2>(kn);
+                           }
 
                            for (size_t i = 0; i < vc[v].size(); ++i)
                            {
                                int l = vc[v][i];
                                auto u = vmap[v][i];
+
+                               auto w = uvweight[l].get()[u];
+                               lweight[v].push_back(l);
+                               lweight[v].push_back(w);
+
+                               if (!with_degs)
+                                   continue;
+
                                auto& d = udegs[l + 1].get()[u];
                                auto& h = ndegs[std::make_tuple(l + 1, v)];
                                for (auto& kn : d)
@@ -550,10 +646,11 @@ void export_layered_blockmodel_state()
     def("split_layers", &split_layers);
     def("split_groups", &split_groups);
     def("get_rvmap", &get_rvmap);
+    def("get_layered_block_graph", &get_layered_block_graph);
     def("get_layered_block_degs", &get_layered_block_degs);
     def("get_mapped_block_degs", &get_mapped_block_degs);
-    def("get_ldegs", &get_ldegs);
-    def("get_lweights", &get_lweights);
+    def("get_layers_mapped_block_degs", &get_layers_mapped_block_degs);
+    def("get_lweights_ldegs", &get_lweights_ldegs);
     def("get_blweights", &get_blweights);
 
     class_<ldegs_map_t>("ldegs_map_t")
@@ -112,6 +112,7 @@ struct Layers
             vector<size_t>& _free_blocks;
             size_t _l;
             size_t _E;
+            openmp_mutex _llock;
 
             using BaseState::_bg;
             using BaseState::_wr;
@@ -497,8 +498,6 @@ struct Layers
 
             if (ea.adjacency || ea.recs || ea.edges_dl)
             {
-                scoped_lock lck(_llock);
-
                 entropy_args_t lea(ea);
                 lea.partition_dl = false;
 
@@ -521,6 +520,11 @@ struct Layers
                     if (state._vweight[u] == 0)
                         continue;
 
+                    // get_block_map() may add blocks to the layer, so
+                    // concurrent moves need to be serialized, but only
+                    // within the same layer
+                    scoped_lock lck(state._llock);
+
                     size_t s_u = (s != null_group) ?
                         state.get_block_map(s, false) : null_group;
                     size_t r_u = (r != null_group) ?
@@ -108,6 +108,11 @@ void export_layered_overlap_blockmodel_state()
                                &state_t::get_B_E)
                           .def("get_B_E_D",
                                &state_t::get_B_E_D)
+                          .def("get_actual_B",
+                               +[](state_t& state) -> size_t
+                                {
+                                    return state._actual_B;
+                                })
                           .def("get_layer",
                                +[](state_t& state, size_t l) -> python::object
                                 {
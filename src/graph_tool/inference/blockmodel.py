@@ -2352,6 +2352,9 @@ def model_entropy(B, N, E, directed=False, nr=None, allow_empty=True):
     ``False``, the partition term :math:`-\ln P(\boldsymbol{b})` is omitted
     entirely.
 
+    If ``nr`` is ``False``, ``B`` and ``E`` can also be arrays, in which case an
+    array of values is returned, computed element-wise.
+
     References
     ----------
 
@@ -26,8 +26,10 @@ if sys.version_info < (3,):
 from .. import _degree, _prop, Graph, GraphView, libcore, _get_rng, PropertyMap, \
     conv_pickle_state
 import random
-from numpy import *
+from numpy import isnan, isinf
 import numpy
+import math
+import itertools
 from collections import defaultdict
 from scipy.special import gammaln
 import copy
@@ -41,12 +43,12 @@ from .. decorators import _wraps
 from .. dl_import import dl_import
 dl_import("from . import libgraph_tool_inference as libinference")
 
-from .. generation import graph_union
 from .. stats import vertex_hist
 
-from . blockmodel import *
-from . blockmodel import _bm_test
-from . overlap_blockmodel import *
+from . util import dmask, pmap
+from . blockmodel import BlockState, set_test, get_entropy_args, \
+    model_entropy, _bm_test
+from . overlap_blockmodel import OverlapBlockState
 
 class LayeredBlockState(OverlapBlockState, BlockState):
     r"""The (possibly overlapping) block state of a given graph, where the edges are
@@ -111,7 +113,8 @@ class LayeredBlockState(OverlapBlockState, BlockState):
 
         self.g = g
 
-        if kwargs.pop("ec_done", False) or ec is None:
+        ec_done = kwargs.pop("ec_done", False)
+        if ec_done or ec is None:
             self.ec = ec
         else:
             self.ec = ec = perfect_prop_hash([ec], "int32_t")[0]
@@ -178,10 +181,11 @@ class LayeredBlockState(OverlapBlockState, BlockState):
         self.agg_state = agg_state
 
         if overlap and self.ec is not None:
-            self.base_ec = self.base_g.own_property(ec.copy())
-            ec = agg_state.eindex.copy()
-            pmap(ec, self.ec)
-            self.ec = ec.copy("int")
+            # otherwise perfect_prop_hash() above already made a private copy
+            if ec_done:
+                ec = ec.copy()
+            self.base_ec = self.base_g.own_property(ec)
+            self.ec = self.g.new_ep("int", ec.fa[agg_state.eindex.fa])
 
         self.eweight = eweight
         self.vweight = vweight
@@ -215,17 +219,40 @@ class LayeredBlockState(OverlapBlockState, BlockState):
         lweights = kwargs.pop("lweights", self.g.new_vp("vector<int>"))
 
         if len(self.gs) == 0:
+            # create the layer graphs and collect their property maps in a
+            # single pass
+            directed = g.is_directed()
+            nrec = len(self.rec)
+            ndrec = len(self.drec)
+            ugs, ub, urec, udrec, ueweight, uvweight, ubrmap, uvmap = \
+                [], [], [], [], [], [], [], []
             for l in range(0, self.C):
-                u = Graph(directed=g.is_directed())
-                u.vp["b"] = u.new_vp("int")
-                u.vp["weight"] = u.new_vp("int")
-                u.ep["weight"] = u.new_ep("int")
-                u.gp["rec"] = u.new_gp("object", val=[u.new_ep("double") for i in range(len(self.rec))])
-                u.gp["drec"] = u.new_gp("object", val=[u.new_ep("double") for i in range(len(self.drec))])
-                u.vp["brmap"] = u.new_vp("int")
-                u.vp["vmap"] = u.new_vp("int")
+                u = Graph(directed=directed)
+                b_u = u.new_vp("int")
+                u.vp["b"] = b_u
+                vweight_u = u.new_vp("int")
+                u.vp["weight"] = vweight_u
+                eweight_u = u.new_ep("int")
+                u.ep["weight"] = eweight_u
+                rec_u = [u.new_ep("double") for i in range(nrec)]
+                drec_u = [u.new_ep("double") for i in range(ndrec)]
+                u.gp["rec"] = u.new_gp("object", val=rec_u)
+                u.gp["drec"] = u.new_gp("object", val=drec_u)
+                brmap_u = u.new_vp("int")
+                u.vp["brmap"] = brmap_u
+                vmap_u = u.new_vp("int")
+                u.vp["vmap"] = vmap_u
                 self.gs.append(u)
 
+                ugs.append(u._Graph__graph)
+                ub.append(_prop("v", u, b_u))
+                urec.append([_prop("e", u, x) for x in rec_u])
+                udrec.append([_prop("e", u, x) for x in drec_u])
+                ueweight.append(_prop("e", u, eweight_u))
+                uvweight.append(_prop("v", u, vweight_u))
+                ubrmap.append(_prop("v", u, brmap_u))
+                uvmap.append(_prop("v", u, vmap_u))
+
             libinference.split_layers(self.g._Graph__graph,
                                       _prop("e", self.g, self.ec),
                                       _prop("v", self.g, self.b),
@@ -236,15 +263,8 @@ class LayeredBlockState(OverlapBlockState, BlockState):
                                       _prop("v", self.g, self.vc),
                                       _prop("v", self.g, self.vmap),
                                       _prop("v", self.g, lweights),
-                                      [u._Graph__graph for u in self.gs],
-                                      [_prop("v", u, u.vp["b"]) for u in self.gs],
-                                      [[_prop("e", u, x) for x in u.gp["rec"]] for u in self.gs],
-                                      [[_prop("e", u, x) for x in u.gp["drec"]] for u in self.gs],
-                                      [_prop("e", u, u.ep["weight"]) for u in self.gs],
-                                      [_prop("v", u, u.vp["weight"]) for u in self.gs],
-                                      self.block_map,
-                                      [_prop("v", u, u.vp["brmap"]) for u in self.gs],
-                                      [_prop("v", u, u.vp["vmap"]) for u in self.gs])
+                                      ugs, ub, urec, udrec, ueweight, uvweight,
+                                      self.block_map, ubrmap, uvmap)
         else:
             libinference.split_groups(_prop("v", self.g, self.b),
                                       _prop("v", self.g, self.vc),
@@ -266,8 +286,6 @@ class LayeredBlockState(OverlapBlockState, BlockState):
             self.degs = agg_state.degs
             self.merge_map = agg_state.merge_map
 
-        self.layer_states = []
-
         self.max_BE = max_BE
         self.bg = agg_state.bg
         self.wr = agg_state.wr
@@ -287,23 +305,11 @@ class LayeredBlockState(OverlapBlockState, BlockState):
 
         self._coupled_state = None
 
-        for l, u in enumerate(self.gs):
-            state = self.__gen_state(l, u, ldegs)
-            self.layer_states.append(state)
-
-        if ec is None:
-            self.ec = self.g.new_ep("int")
-
-        if not self.overlap:
-            self._state = \
-                libinference.make_layered_block_state(agg_state._state,
-                                                      self)
-        else:
-            self._state = \
-                libinference.make_layered_overlap_block_state(agg_state._state,
-                                                              self)
-        if ec is None:
-            self.ec = None
+        # the layer states and the layered C++ state are only built when
+        # first needed (see __init_layer_states())
+        self.__ldegs = ldegs
+        self.__layer_states = None
+        self.__bstate = None
 
         if _bm_test():
             assert self.mrs.fa.sum() == self.eweight.fa.sum(), "inconsistent mrs!"
@@ -318,6 +324,45 @@ class LayeredBlockState(OverlapBlockState, BlockState):
             warnings.warn("unrecognized keyword arguments: " +
                           str(list(kwargs.keys())))
 
+    def __init_layer_states(self):
+        ldegs = self.__ldegs
+        if not self.overlap and ldegs is not None:
+            udegs = libinference.get_layers_mapped_block_degs([u._Graph__graph for u in self.gs],
+                                                              ldegs,
+                                                              [_prop("v", u, u.vp.vmap) for u in self.gs])
+        else:
+            udegs = [None] * len(self.gs)
+
+        self.__layer_states = [self.__gen_state(l, u, degs) for l, (u, degs)
+                               in enumerate(zip(self.gs, udegs))]
+
+        ec = self.ec
+        if ec is None:
+            self.ec = self.g.new_ep("int")
+
+        if not self.overlap:
+            self.__bstate = \
+                libinference.make_layered_block_state(self.agg_state._state,
+                                                      self)
+        else:
+            self.__bstate = \
+                libinference.make_layered_overlap_block_state(self.agg_state._state,
+                                                              self)
+        self.ec = ec
+        self.__ldegs = None
+
+    @property
+    def layer_states(self):
+        if self.__layer_states is None:
+            self.__init_layer_states()
+        return self.__layer_states
+
+    @property
+    def _state(self):
+        if self.__bstate is None:
+            self.__init_layer_states()
+        return self.__bstate
+
     def get_N(self):
         r"Returns the total number of edges."
         return self.agg_state.get_N()
@@ -337,26 +382,22 @@ class LayeredBlockState(OverlapBlockState, BlockState):
     def __get_base_u(self, u):
         node_index = u.vp["vmap"].copy("int64_t")
         pmap(node_index, self.agg_state.node_index)
-        base_u, nindex, vcount, ecount = \
-            condensation_graph(u, node_index,
-                               self_loops=True,
-                               parallel_edges=True)[:4]
-        rindex = zeros(nindex.a.max() + 1, dtype="int64")
-        reverse_map(nindex, rindex)
-        pmap(node_index, rindex)
+        # Equivalent to condensation_graph(u, node_index, self_loops=True,
+        # parallel_edges=True), since all edges are kept and only the vertex
+        # grouping is needed
+        nidx, idx = numpy.unique(node_index.fa, return_inverse=True)
+        base_u = Graph(directed=u.is_directed())
+        base_u.add_vertex(len(nidx))
+        base_u.add_edge_list(idx[u.get_edges()[:, :2]])
+        nindex = base_u.new_vertex_property("int64_t")
+        nindex.fa = nidx
+        node_index.fa = idx
         base_u.vp["vmap"] = nindex
         return base_u, node_index
 
-    def __gen_state(self, l, u, ldegs):
+    def __gen_state(self, l, u, degs):
         B = u.num_vertices() + 1
         if not self.overlap:
-            if ldegs is not None:
-                degs = libinference.get_mapped_block_degs(u._Graph__graph,
-                                                          ldegs, l + 1,
-                                                           _prop("v", u,
-                                                                 u.vp.vmap))
-            else:
-                degs = None
             state = BlockState(u, b=u.vp["b"],
                                B=B,
                                recs=u.gp["rec"],
@@ -427,20 +468,19 @@ class LayeredBlockState(OverlapBlockState, BlockState):
         lweights = self.g.new_vp("vector<int>")
         degs = None
         if not self.overlap:
-            libinference.get_lweights(self.g._Graph__graph,
-                                      _prop("v", self.g, self.vc),
-                                      _prop("v", self.g, self.vmap),
-                                      _prop("v", self.g, lweights),
-                                      [_prop("v", state.g, state.vweight)
-                                       for state in self.layer_states])
             if not isinstance(self.agg_state.degs, libinference.simple_degs_t):
-                degs = libinference.get_ldegs(self.g._Graph__graph,
-                                              _prop("v", self.g, self.vc),
-                                              _prop("v", self.g, self.vmap),
-                                              [self.agg_state.degs] +
-                                              [state.degs for state
-                                               in self.layer_states])
+                udegs = [self.agg_state.degs] + [state.degs for state
+                                                 in self.layer_states]
             else:
+                udegs = []
+            degs = libinference.get_lweights_ldegs(self.g._Graph__graph,
+                                                   _prop("v", self.g, self.vc),
+                                                   _prop("v", self.g, self.vmap),
+                                                   _prop("v", self.g, lweights),
+                                                   [_prop("v", state.g, state.vweight)
+                                                    for state in self.layer_states],
+                                                   udegs)
+            if len(udegs) == 0:
                 degs = None
 
         ec = self.ec if ec is None else ec
@@ -507,37 +547,23 @@ class LayeredBlockState(OverlapBlockState, BlockState):
         r"""Returns the block graph."""
 
         bg = Graph(directed=self.g.is_directed())
+        bg.add_vertex(self.B)
         mrs = bg.new_ep("int")
         ec = bg.new_ep("int")
-        rec = bg.new_edge_property("vector<double>")
-        drec = bg.new_edge_property("vector<double>")
-
-        for l in range(self.C):
-            u = GraphView(self.g, efilt=self.ec.a == l)
-            ug = get_block_graph(u, self.B, self.b, self.vweight, self.eweight,
-                                 rec=self.rec, drec=self.drec)
-            uec = ug.new_ep("int")
-            uec.a = l
-            if len(ug.gp.rec) > 0:
-                urec = group_vector_property(ug.gp.rec)
-                udrec = group_vector_property(ug.gp.drec)
-            else:
-                urec = ug.new_ep("vector<double>")
-                udrec = ug.new_ep("vector<double>")
-            bg, props = graph_union(bg, ug,
-                                    props=[(mrs, ug.ep["count"]),
-                                           (ec, uec),
-                                           (rec, urec),
-                                           (drec, udrec)],
-                                    intersection=ug.vertex_index,
-                                    include=True)
-            mrs = props[0]
-            ec = props[1]
-            rec = props[2]
-            drec = props[3]
-
-        rec = ungroup_vector_property(rec, range(len(self.rec)))
-        drec = ungroup_vector_property(drec, range(len(self.drec)))
+        rec = [bg.new_ep("double") for i in range(len(self.rec))]
+        drec = [bg.new_ep("double") for i in range(len(self.drec))]
+
+        libinference.get_layered_block_graph(self.g._Graph__graph,
+                                             bg._Graph__graph,
+                                             _prop("v", self.g, self.b),
+                                             _prop("e", self.g, self.ec),
+                                             _prop("e", self.g, self.eweight),
+                                             [_prop("e", self.g, x) for x in self.rec],
+                                             [_prop("e", self.g, x) for x in self.drec],
+                                             _prop("e", bg, mrs),
+                                             _prop("e", bg, ec),
+                                             [_prop("e", bg, x) for x in rec],
+                                             [_prop("e", bg, x) for x in drec])
 
         return bg, mrs, ec, rec, drec
 
@@ -781,7 +807,7 @@ class LayeredBlockState(OverlapBlockState, BlockState):
                              self._coupled_state[0].layer_states):
                 b = s.bclabel
                 mask = bs.vweight.fa > 0
-                if any(b.fa[mask] != bs.b.fa[mask]):
+                if numpy.any(b.fa[mask] != bs.b.fa[mask]):
                     return False
         return True
 
@@ -808,24 +834,25 @@ class LayeredBlockState(OverlapBlockState, BlockState):
                                **dict(kwargs, test=False))
 
         if dl and edges_dl:
+            Es = numpy.array([state.get_E() for state in self.layer_states],
+                             dtype="int64")
             if self.layers:
-                for state in self.layer_states:
-                    if not self.allow_empty:
-                        actual_B = (state.wr.a > 0).sum()
-                    else:
-                        actual_B = self.B
-                    S += model_entropy(actual_B, 0, state.get_E(),
-                                       directed=self.g.is_directed(),
-                                       nr=False)
+                if not self.allow_empty:
+                    actual_B = numpy.array([(state.wr.a > 0).sum()
+                                            for state in self.layer_states],
+                                           dtype="int64")
+                else:
+                    actual_B = self.B
             else:
                 if not self.allow_empty:
-                    actual_B = (self.wr.a > 0).sum()
+                    actual_B = self._state.get_actual_B()
+                    if _bm_test():
+                        assert actual_B == (self.wr.a > 0).sum(), \
+                            "inconsistent number of nonempty blocks"
                 else:
                     actual_B = self.B
-                for state in self.layer_states:
-                    S += model_entropy(actual_B, 0, state.get_E(),
-                                       directed=self.g.is_directed(),
-                                       nr=False)
+            S += model_entropy(actual_B, 0, Es, directed=self.g.is_directed(),
+                               nr=False).sum()
 
         if _bm_test() and kwargs.get("test", True):
             assert not isnan(S) and not isinf(S), \
@@ -1109,7 +1136,7 @@ def init_layer_confined(g, ec):
     tmp_state = tmp_state.copy(overlap=True)
     be = tmp_state.get_edge_blocks()
     ba = ungroup_vector_property(be, [0])[0]
-    ba.fa = ba.fa + ec.fa * (ba.fa.max() + 1)
-    continuous_map(ba)
-    be = group_vector_property([ba, ba])
+    a = ba.fa + ec.fa * (ba.fa.max() + 1)
+    ba.fa = numpy.unique(a, return_inverse=True)[1]
+    group_vector_property([ba, ba], vprop=be)
     return be
\ No newline at end of file
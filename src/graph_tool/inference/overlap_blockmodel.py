@@ -212,7 +212,7 @@ class OverlapBlockState(BlockState):
         self.B = B
 
         self.candidate_blocks = Vector_size_t()
-        self.candidate_blocks.extend(arange(self.B, dtype="int"))
+        self.candidate_blocks.iota(self.B)
 
         if pclabel is not None:
             if isinstance(pclabel, PropertyMap):
@@ -71,10 +71,17 @@ def verbose_push(verbose, push):
     return False
 
 def lbinom(n, k):
-    """Return log of binom(n, k)."""
-    return (scipy.special.gammaln(float(n + 1)) -
-            scipy.special.gammaln(float(n - k + 1)) -
-            scipy.special.gammaln(float(k + 1)))
+    """Return log of binom(n, k). The arguments can also be arrays, in which case
+    the values are computed element-wise."""
+    if isscalar(n) and isscalar(k):
+        return (scipy.special.gammaln(float(n + 1)) -
+                scipy.special.gammaln(float(n - k + 1)) -
+                scipy.special.gammaln(float(k + 1)))
+    n = asarray(n, dtype="float")
+    k = asarray(k, dtype="float")
+    return (scipy.special.gammaln(n + 1) -
+            scipy.special.gammaln(n - k + 1) -
+            scipy.special.gammaln(k + 1))
 
 def lbinom_careful(n, k):
     return libinference.lbinom_careful(n, k)